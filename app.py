@@ -1,54 +1,210 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_swagger_ui import get_swaggerui_blueprint
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
 from flask_caching import Cache
-import json
+from flask_compress import Compress
+from flask.json.provider import JSONProvider
+import atexit
+import gzip
+import hashlib
+import mmap
+import multiprocessing
 import os
+import pickle
+import queue
+import re
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from dotenv import load_dotenv
 from functools import wraps
+import orjson
 import requests
 
 # Constants for LFS
 LFS_URL = "https://github.com/slpixe/py-book/raw/refs/heads/master/data/found_books_filtered.ndjson"
 
+# (connect, read) timeouts in seconds for the LFS download
+LFS_TIMEOUT = (5, 30)
+# Bytes read from the LFS response at a time; each chunk is written and parsed as it arrives
+LFS_CHUNK_BYTES = 1024 * 1024
+
+# Book fields exposed by the API, in response order
+FIELDS = ('name', 'author', 'language', 'genre', 'publisher', 'release_date', 'media_type', 'pages', 'isbn')
+ALLOWED_FIELDS = frozenset(FIELDS)
+# Fields with many repeated values, stored as one shared str per distinct value
+DEDUPLICATED_FIELDS = ('author', 'language', 'genre', 'publisher', 'release_date', 'media_type', 'pages')
+
+# Bump when the layout of the books cache or the search indexes changes
+BOOKS_CACHE_VERSION = 2
+
+# Data files at least this large are parsed by several processes when CPUs
+# allow. Shipping each range's books back to the parent costs about half the
+# serial parse, so the bundled ~60MB file stays serial
+PARALLEL_LOAD_MIN_BYTES = 256 * 1024 * 1024
+LOAD_WORKERS = min(os.cpu_count() or 1, 8)
+
+# Joined search columns are UTF-8 bytes separated by a byte that never appears in book data
+COLUMN_SEPARATOR = b'\x00'
+# Hits a buffer scan may collect before a row-by-row scan is cheaper
+BUFFER_SCAN_MAX_HITS = 256
+# Trigram candidates are only used when the rarest posting list covers at most this share of books
+TRIGRAM_MAX_FRACTION = 4
+# Fields with at most this share of distinct values are searched value by value
+DICTIONARY_MAX_SELECTIVITY = 0.2
+# Later filters on such fields intersect id sets once survivors outnumber distinct values this many times
+DICTIONARY_INTERSECT_FACTOR = 8
+# A complete ISBN-10 or ISBN-13, optionally hyphenated, as lowercased search input
+FULL_ISBN = re.compile(r'(?:\d-?){9}[\dx]|(?:\d-?){12}\d')
+# Stretches of ISBN characters within a stored isbn value
+ISBN_RUN = re.compile(r'[\dx-]{10,}')
+
+# /all pages for these limits are encoded once at load time
+PRECOMPUTED_LIMITS = (25, 50, 100)
+# Most requested /all (limit, page) combinations, also kept gzipped
+POPULAR_PAGES = frozenset([(100, page) for page in range(1, 11)] + [(50, 1)])
+# Other /all pages with at least this many books are streamed in chunks
+STREAM_MIN_BOOKS = 1000
+STREAM_CHUNK_BOOKS = 100
+# Largest /all page served; bigger limits are clamped to it
+MAX_LIMIT = 5000
+# Bodies larger than this are not kept in the response cache, so broad
+# /search queries cannot fill it with megabytes each
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024
+
 # Load environment variables
 load_dotenv()
 
+# Shared HTTP session so repeated downloads reuse the connection
+http_session = requests.Session()
+
+# JSON provider that serializes jsonify responses with orjson
+class OrjsonProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of decoding
+        # them to str for Werkzeug to encode again
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
-# Configure logging
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-file_handler = RotatingFileHandler('logs/api.log', maxBytes=10240, backupCount=10)
-file_handler.setFormatter(logging.Formatter(
-    '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-))
-file_handler.setLevel(logging.INFO)
-app.logger.addHandler(file_handler)
-app.logger.setLevel(logging.INFO)
+def start_log_listener():
+    """Start a thread writing queued log records to the log file.
+
+    Threads do not survive fork, so besides this process each gunicorn
+    worker calls it once after forking (see gunicorn.conf.py). Returns the
+    listener, or None when LOG_TO_FILE is unset.
+    """
+    if log_queue is None:
+        return None
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+# Configure logging: Flask's default handler writes to stderr, where the
+# process manager collects it; a rotating log file is opt-in because its
+# lock and disk writes serialize requests
+log_queue = None
+if os.getenv('LOG_TO_FILE'):
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    file_handler = RotatingFileHandler('logs/api.log', maxBytes=10240, backupCount=10)
+    file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+    ))
+    # Requests only enqueue records; a listener thread does the file writes
+    log_queue = queue.SimpleQueue()
+    app.logger.addHandler(QueueHandler(log_queue))
+    start_log_listener()
+app.logger.setLevel(os.getenv('LOG_LEVEL', 'WARNING').upper())
 app.logger.info('API startup')
 
 # Initialize CORS
 CORS(app)
 
+# Shared Redis for the response cache and rate limits, so every gunicorn
+# worker sees the same entries and counters instead of its own copy
+REDIS_URL = os.getenv('REDIS_URL')
+# The limits package names unix socket Redis URLs redis+unix://, where
+# Flask-Caching and redis-py take unix://
+LIMITER_STORAGE_URI = re.sub(r'^unix://', 'redis+unix://', REDIS_URL) if REDIS_URL else "memory://"
+
 # Initialize Caching
 cache_config = {
-    "CACHE_TYPE": os.getenv("CACHE_TYPE", "simple"),
-    "CACHE_DEFAULT_TIMEOUT": int(os.getenv("CACHE_DEFAULT_TIMEOUT", 300))
+    "CACHE_TYPE": os.getenv("CACHE_TYPE", "RedisCache" if REDIS_URL else "simple"),
+    "CACHE_DEFAULT_TIMEOUT": int(os.getenv("CACHE_DEFAULT_TIMEOUT", 300)),
+    # A prefix keeps cache.clear() from flushing the whole Redis database
+    "CACHE_KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "wikipedia-book-api:")
 }
+if REDIS_URL:
+    cache_config["CACHE_REDIS_URL"] = REDIS_URL
 cache = Cache(app, config=cache_config)
 
+def compress_cache_key(req):
+    """Cache key for a compressed body, per URL and accepted encodings"""
+    key = f"{req.full_path} {req.headers.get('Accept-Encoding', '')}"
+    return 'compress_' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class SizeCappedCache:
+    """Front for cache that skips storing values above RESPONSE_CACHE_MAX_BYTES"""
+    def get(self, key):
+        return cache.get(key)
+
+    def set(self, key, value):
+        if len(value) <= RESPONSE_CACHE_MAX_BYTES:
+            cache.set(key, value)
+
+# Compress JSON responses, preferring Brotli. Bodies that already carry a
+# Content-Encoding (the pre-gzipped /all pages) are left alone, streamed
+# pages stay streamed rather than being buffered, and compressed bodies
+# are kept in the response cache so a cached /search result is not
+# compressed again on every hit
+app.config.update(
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_LEVEL=4,
+    COMPRESS_BR_LEVEL=4,
+    COMPRESS_MIN_SIZE=512,
+    COMPRESS_STREAMS=False,
+    COMPRESS_CACHE_BACKEND=SizeCappedCache,
+    COMPRESS_CACHE_KEY=compress_cache_key,
+)
+Compress(app)
+
+@app.before_request
+def drop_refused_encodings():
+    """Remove codings the client refused with q=0 from Accept-Encoding.
+
+    Flask-Compress ranks the listed codings by quality but still picks one
+    whose quality is 0, which RFC 9110 defines as not acceptable.
+    """
+    header = request.headers.get('Accept-Encoding')
+    if header and 'q=0' in header.replace(' ', ''):
+        request.environ['HTTP_ACCEPT_ENCODING'] = ', '.join(
+            f'{coding};q={quality}' for coding, quality in request.accept_encodings if quality > 0)
+
 # Initialize Rate Limiter
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=[f"{os.getenv('RATE_LIMIT', '100')}/day"],
-    storage_uri="memory://"
+    storage_uri=LIMITER_STORAGE_URI,
+    # fixed-window costs one counter increment per request; moving-window
+    # rejects bursts across window edges at the cost of a timestamp list
+    strategy=os.getenv('RATE_LIMIT_STRATEGY', 'fixed-window')
 )
 
 # Security headers middleware
@@ -60,22 +216,17 @@ def add_security_headers(response):
     response.headers['X-XSS-Protection'] = '1; mode=block'
     return response
 
-# Request logging decorator
-def log_request(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        app.logger.info(f'Request to {request.path} with params: {request.args}')
-        return f(*args, **kwargs)
-    return wrapper
-
-# Error handling decorator
-def handle_errors(f):
+# Request logging and error handling decorator, a single wrapper frame per request
+def observe(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
+        # %-style arguments are only formatted if the record is emitted
+        if app.logger.isEnabledFor(logging.INFO):
+            app.logger.info('Request to %s with params: %s', request.path, request.args)
         try:
             return f(*args, **kwargs)
         except Exception as e:
-            app.logger.error(f'Error: {str(e)}')
+            app.logger.exception('Error: %s', e)
             return jsonify({'error': 'Internal server error'}), 500
     return wrapper
 
@@ -299,84 +450,444 @@ def load_books_data():
         app.logger.error(f'Database file not found: {data_file}')
         return False
     
-    # Check if file is a Git LFS pointer file
-    try:
-        with open(data_file, 'r') as f:
-            content = f.read().strip()
-            if content.startswith('version https://git-lfs'):
-                app.logger.info('Found LFS pointer file, downloading actual content...')
-                response = requests.get(LFS_URL, stream=True)
-                response.raise_for_status()
-                
-                with open(data_file, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                app.logger.info('Successfully downloaded actual content from LFS')
-                # After downloading LFS content, we need to parse it
-                return load_books_data()  # Recursively load books from downloaded content
-    except Exception as e:
-        app.logger.error(f'Error checking/downloading file: {str(e)}')
+    # Check if file is a Git LFS pointer file, downloading the real content at most once
+    downloaded = False
+    parsed = None  # parse result of the downloaded content
+    while True:
+        try:
+            # A pointer file is identified by its first line, so never read past it
+            with open(data_file, 'rb') as f:
+                head = f.read(64).lstrip()
+            if not head.startswith(b'version https://git-lfs'):
+                break
+            if downloaded:
+                app.logger.error('Downloaded LFS content is still a pointer file')
+                return False
+            app.logger.info('Found LFS pointer file, downloading actual content...')
+            parsed = download_lfs_file(data_file)
+            downloaded = True
+            app.logger.info('Successfully downloaded actual content from LFS')
+        except Exception as e:
+            app.logger.error(f'Error checking/downloading file: {str(e)}')
+            return False
+    
+    if os.path.getsize(data_file) == 0:
+        app.logger.warning(f'Database file is empty: {data_file}')
         return False
     
+    # Reuse the parsed corpus from a previous boot when it is still current
+    cache_file = os.getenv('BOOKS_CACHE_FILE', f'{data_file}.pkl')
+    cached = read_books_cache(data_file, cache_file) if cache_file and parsed is None else None
+    if cached:
+        cached_books, search_index = cached
+        books.extend(cached_books)
+        app.logger.info(f'Loaded {len(books)} books from cache {cache_file}')
+        build_indexes(search_index)
+        return True
+    
     # Load the books data
     try:
-        loaded_books = []  # Use a local list first
-        with open(data_file, 'r', encoding='utf-8') as f:
-            app.logger.info('Successfully opened database file, parsing content...')
-            line_count = 0
-            error_count = 0
-            for line in f:
-                try:
-                    line_count += 1
-                    parsed_line = json.loads(line)
-                    if not isinstance(parsed_line, list) or len(parsed_line) < 2:
-                        app.logger.warning(f'Invalid data format at line {line_count}: Expected list with at least 2 elements')
-                        error_count += 1
-                        continue
-                    
-                    book_data = parsed_line[1]  # Get the second element (book data)
-                    book = {
-                        'name': book_data.get('name', ''),
-                        'author': book_data.get('author', ''),
-                        'language': book_data.get('language', ''),
-                        'genre': book_data.get('genre', ''),
-                        'publisher': book_data.get('publisher', ''),
-                        'release_date': book_data.get('release_date', ''),
-                        'media_type': book_data.get('media_type', ''),
-                        'pages': book_data.get('pages', ''),
-                        'isbn': book_data.get('isbn', '')
-                    }
-                    loaded_books.append(book)
-                except (json.JSONDecodeError, IndexError) as e:
-                    app.logger.error(f'Error parsing line {line_count}: {str(e)}')
-                    error_count += 1
-                    continue
-            
-            app.logger.info(f'Finished processing {line_count} lines with {error_count} errors')
-            app.logger.info(f'Found {len(loaded_books)} valid books to load')
+        app.logger.info('Parsing database file...')
+        if parsed is not None:
+            loaded_books, line_count, problems = parsed
+        elif os.path.getsize(data_file) >= PARALLEL_LOAD_MIN_BYTES and LOAD_WORKERS > 1 \
+                and 'fork' in multiprocessing.get_all_start_methods():
+            loaded_books, line_count, problems = parse_books_parallel(data_file, LOAD_WORKERS)
+        else:
+            loaded_books, line_count, problems = parse_books(data_file)
+        for level, message, line_number, detail in problems:
+            app.logger.log(level, message, line_number, detail)
+        error_count = len(problems)
+        
+        app.logger.info(f'Finished processing {line_count} lines with {error_count} errors')
+        app.logger.info(f'Found {len(loaded_books)} valid books to load')
+        
+        if loaded_books:
+            deduplicate_fields(loaded_books)
+            # Only update the global books list if we successfully loaded data
+            app.logger.info('Updating global books list...')
+            books.clear()
+            books.extend(loaded_books)
+            app.logger.info(f'Successfully loaded {len(books)} books from {data_file}')
             
-            if loaded_books:
-                # Only update the global books list if we successfully loaded data
-                app.logger.info('Updating global books list...')
-                books.clear()
-                books.extend(loaded_books)
-                app.logger.info(f'Successfully loaded {len(books)} books from {data_file}')
-                
-                # Double check the books were actually loaded
-                if not books:
-                    app.logger.error('Books list is empty after update!')
-                    return False
-                return True
-            else:
-                app.logger.warning('No valid books were loaded from the file')
+            # Double check the books were actually loaded
+            if not books:
+                app.logger.error('Books list is empty after update!')
                 return False
+            build_indexes()
+            if cache_file:
+                write_books_cache(cache_file, books)
+            return True
+        else:
+            app.logger.warning('No valid books were loaded from the file')
+            return False
     except Exception as e:
         app.logger.error(f'Error reading database file: {str(e)}')
         return False
 
+def download_lfs_file(data_file):
+    """Replace an LFS pointer file with the real data from LFS_URL.
+
+    The content is parsed while it downloads rather than read back from
+    disk afterwards; returns the parse_lines result.
+    """
+    tmp_file = f'{data_file}.{os.getpid()}.download'
+    try:
+        response = http_session.get(LFS_URL, stream=True, timeout=LFS_TIMEOUT)
+        response.raise_for_status()
+        with open(tmp_file, 'wb') as f:
+            parsed = parse_lines(tee_lines(response.iter_content(chunk_size=LFS_CHUNK_BYTES), f))
+        os.replace(tmp_file, data_file)  # Never leave a partially downloaded data file
+        return parsed
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def tee_lines(chunks, f):
+    """Write each chunk to f and yield the lines they contain"""
+    tail = b''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        f.write(chunk)
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+def parse_books(data_file, start=0, end=None):
+    """Parse the NDJSON lines of data_file that start within [start, end).
+
+    Returns (books, line_count, problems). Problems are (level, message,
+    line_number, detail) tuples with line numbers counted from start; they
+    are returned rather than logged because this also runs in worker
+    processes.
+    """
+    with open(data_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if end is None:
+            end = mm.size()
+        mm.seek(start)
+        return parse_lines(mapped_lines(mm, end))
+
+def mapped_lines(mm, end):
+    """Yield the lines of mm from its position until one starts at or after end"""
+    # mmap.readline measured faster here than reading large chunks and
+    # splitting them, so lines are taken straight off the mapping
+    while mm.tell() < end:
+        yield mm.readline()
+
+def parse_lines(lines):
+    """Parse NDJSON book lines; returns (books, line_count, problems) as parse_books does"""
+    parsed_books = []
+    problems = []
+    line_count = 0
+    for line in lines:
+        line_count += 1
+        try:
+            parsed_line = orjson.loads(line)
+            if not isinstance(parsed_line, list) or len(parsed_line) < 2:
+                problems.append((logging.WARNING, 'Invalid data format at line %d: %s', line_count,
+                                 'Expected list with at least 2 elements'))
+                continue
+            
+            book_data = parsed_line[1]  # Get the second element (book data)
+            # Coerce once here so everything downstream can rely on str values
+            book = {field: str(book_data.get(field, '')) for field in FIELDS}
+            parsed_books.append(book)
+        except (orjson.JSONDecodeError, IndexError) as e:
+            problems.append((logging.ERROR, 'Error parsing line %d: %s', line_count, str(e)))
+            continue
+    return parsed_books, line_count, problems
+
+def parse_books_parallel(data_file, workers):
+    """Parse data_file in line-aligned byte ranges, one per worker process"""
+    size = os.path.getsize(data_file)
+    cuts = [0]
+    with open(data_file, 'rb') as f:
+        for k in range(1, workers):
+            # Step back one byte so a line starting exactly at the cut is kept
+            f.seek(max(k * size // workers - 1, cuts[-1]))
+            f.readline()
+            cuts.append(max(f.tell(), cuts[-1]))
+    cuts.append(size)
+    
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        parts = list(executor.map(parse_books, repeat(data_file), cuts[:-1], cuts[1:]))
+    
+    parsed_books = []
+    problems = []
+    line_count = 0
+    for part_books, part_lines, part_problems in parts:
+        parsed_books.extend(part_books)
+        problems.extend((level, message, line_count + line_number, detail)
+                        for level, message, line_number, detail in part_problems)
+        line_count += part_lines
+    return parsed_books, line_count, problems
+
+def deduplicate_fields(loaded_books):
+    """Make books share one str object per distinct value of DEDUPLICATED_FIELDS"""
+    for field in DEDUPLICATED_FIELDS:
+        pool = {}
+        for book in loaded_books:
+            value = book[field]
+            book[field] = pool.setdefault(value, value)
+
+def read_books_cache(data_file, cache_file):
+    """Return (books, search index) from the pickle cache, or None if it is
+    missing, older than the data file or written by another version"""
+    try:
+        if os.path.getmtime(cache_file) <= os.path.getmtime(data_file):
+            app.logger.info(f'Books cache {cache_file} is out of date')
+            return None
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+        if not isinstance(cached, tuple) or cached[0] != BOOKS_CACHE_VERSION:
+            app.logger.info(f'Books cache {cache_file} has an old format')
+            return None
+        return cached[1:]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        app.logger.warning(f'Ignoring unreadable books cache {cache_file}: {str(e)}')
+        return None
+
+def write_books_cache(cache_file, loaded_books):
+    """Pickle parsed books and their search index next to the data file so
+    later boots skip parsing and indexing"""
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+    try:
+        # One dump keeps the strings shared between books and index columns shared
+        search_index = tuple(dict(index) for index in search_indexes)
+        with open(tmp_file, 'wb') as f:
+            pickle.dump((BOOKS_CACHE_VERSION, loaded_books, search_index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)  # Never expose a partially written cache
+        app.logger.info(f'Wrote books cache to {cache_file}')
+    except Exception as e:
+        app.logger.warning(f'Could not write books cache {cache_file}: {str(e)}')
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def build_indexes(search_index=None):
+    """Rebuild everything derived from books after they change, restoring
+    the search index from search_index when it was read from the books cache"""
+    if search_index is None:
+        build_search_index()
+    else:
+        for index, saved in zip(search_indexes, search_index):
+            index.clear()
+            index.update(saved)
+    build_page_cache()
+    # Cached responses were built from the previous books. Clearing them is
+    # best effort, so an unreachable cache backend cannot fail the load
+    try:
+        cache.clear()
+    except Exception as e:
+        app.logger.warning(f'Could not clear the response cache: {str(e)}')
+
+def build_search_index():
+    """Precompute lowercased field columns used by search"""
+    lower_index.clear()
+    column_buffers.clear()
+    trigram_index.clear()
+    field_selectivity.clear()
+    value_index.clear()
+    for field in FIELDS:
+        # Lower each distinct value once, reusing the book's own string when
+        # lowering leaves it unchanged (ISBNs, page counts, dates), so the
+        # column mostly adds pointers rather than strings
+        values = [book[field] for book in books]
+        lowered_values = {value: value if (lowered := value.lower()) == value else lowered
+                          for value in set(values)}
+        column = list(map(lowered_values.__getitem__, values))
+        # UTF-8 keeps the buffer at a byte per ASCII character, where one
+        # wide character would widen a joined str for the whole column
+        encoded = [value.encode('utf-8') for value in column]
+        starts = array('q')
+        offset = 0
+        for value in encoded:
+            starts.append(offset)
+            offset += len(value) + 1
+        starts.append(offset)  # sentinel so every book has a following offset
+        lower_index[field] = column
+        field_selectivity[field] = len(set(column)) / max(len(column), 1)
+        if field_selectivity[field] <= DICTIONARY_MAX_SELECTIVITY:
+            values = {}
+            for i, value in enumerate(column):
+                ids = values.get(value)
+                if ids is None:
+                    values[value] = [i]
+                else:
+                    ids.append(i)
+            value_index[field] = {value: array('i', ids) for value, ids in values.items()}
+        column_buffers[field] = (COLUMN_SEPARATOR.join(encoded), starts)
+        postings = {}
+        for i, value in enumerate(column):
+            for gram in trigrams(value):
+                ids = postings.get(gram)
+                if ids is None:
+                    postings[gram] = [i]
+                else:
+                    ids.append(i)
+        trigram_index[field] = {gram: array('i', ids) for gram, ids in postings.items()}
+    build_isbn_index()
+    app.logger.info(f'Built search index for {len(books)} books')
+
+def build_isbn_index():
+    """Map every complete ISBN appearing in a book's isbn to the books containing it"""
+    isbn_index.clear()
+    rows = {}
+    for i, value in enumerate(lower_index['isbn']):
+        ids = rows.get(value)
+        if ids is None:
+            rows[value] = [i]
+        else:
+            ids.append(i)
+    matches = {}
+    for value, ids in rows.items():
+        for isbn in set(isbn_substrings(value)):
+            matches.setdefault(isbn, []).extend(ids)
+    for isbn, ids in matches.items():
+        isbn_index[isbn] = array('i', sorted(ids))
+
+def isbn_substrings(value):
+    """Yield each substring of value that FULL_ISBN matches"""
+    for run in ISBN_RUN.findall(value):
+        digits = [k for k, char in enumerate(run) if char != '-']
+        for j, start in enumerate(digits):
+            for count in (10, 13):
+                if j + count > len(digits):
+                    break
+                isbn = run[start:digits[j + count - 1] + 1]
+                if '--' not in isbn and 'x' not in isbn[:-1] and (count == 10 or isbn[-1] != 'x'):
+                    yield isbn
+
+def trigrams(value):
+    """Return the set of 3-character substrings of value"""
+    return {value[k:k + 3] for k in range(len(value) - 2)}
+
+def scan_column(field, needle):
+    """Return indices of books whose lowercased field contains needle.
+
+    A complete ISBN is looked up in the ISBN index directly.
+    Needles of three or more characters are answered from the trigram
+    postings when those are selective, verifying each candidate.
+    Low-cardinality fields test the needle once per distinct value and
+    merge the matching books. Otherwise the needle is located with
+    bytes.find over the joined column, so non-matching books cost no Python
+    work; needles hitting many books fall back to a row-by-row scan.
+    """
+    if field == 'isbn' and FULL_ISBN.fullmatch(needle):
+        return list(isbn_index.get(needle, ()))
+    column = lower_index[field]
+    if len(needle) >= 3:
+        postings = trigram_index[field]
+        rarest = sorted((postings.get(gram, ()) for gram in trigrams(needle)), key=len)[:2]
+        if len(rarest[0]) <= len(column) // TRIGRAM_MAX_FRACTION:
+            candidates = set(rarest[0]).intersection(*rarest[1:])
+            return [i for i in sorted(candidates) if needle in column[i]]
+    values = value_index.get(field)
+    if values is not None:
+        hits = [ids for value, ids in values.items() if needle in value]
+        return sorted(chain.from_iterable(hits))
+    pattern = needle.encode('utf-8')
+    if pattern and COLUMN_SEPARATOR not in pattern:
+        buffer, starts = column_buffers[field]
+        matches = []
+        pos = buffer.find(pattern)
+        while pos != -1:
+            if len(matches) == BUFFER_SCAN_MAX_HITS:
+                break
+            i = bisect_right(starts, pos) - 1
+            matches.append(i)
+            pos = buffer.find(pattern, starts[i + 1])
+        else:
+            return matches
+    return [i for i, value in enumerate(column) if needle in value]
+
+def page_count(total, limit):
+    """Number of /all pages of limit books needed for total books"""
+    return (total + limit - 1) // limit
+
+def render_all_page(page, limit):
+    """Encode one /all page; page and limit must already be within bounds"""
+    # Calculate slice indices
+    start_idx = (page - 1) * limit
+    end_idx = min(start_idx + limit, len(book_json))  # Don't exceed array bounds
+    
+    # Books are encoded once, so a page only joins their bytes; the layout
+    # matches orjson.dumps of the page dict
+    return b'{"books":[%s],"total":%d,"page":%d,"limit":%d,"total_pages":%d}' % (
+        b','.join(book_json[start_idx:end_idx]), len(book_json), page, limit,
+        page_count(len(book_json), limit))
+
+def build_page_cache():
+    """Encode each book and the /all pages once instead of per request, gzipping the popular ones"""
+    global books_etag
+    book_json[:] = map(orjson.dumps, books)
+    # Derived from the content so every worker and restart agrees on it
+    books_etag = hashlib.sha1(b'\n'.join(book_json)).hexdigest()[:16]
+    page_cache.clear()
+    for limit in PRECOMPUTED_LIMITS:
+        for page in range(1, page_count(len(books), limit) + 1):
+            body = render_all_page(page, limit)
+            gzipped = gzip.compress(body) if (limit, page) in POPULAR_PAGES else None
+            page_cache[(limit, page)] = (body, gzipped)
+
+def stream_all_page(page, limit):
+    """Stream one /all page in chunks, producing the same body as render_all_page"""
+    start_idx = (page - 1) * limit
+    total = len(book_json)
+    # Copy the page's references now so a reload meanwhile cannot mix two corpora
+    encoded = book_json[start_idx:start_idx + limit]
+    
+    def generate():
+        yield b'{"books":['
+        for chunk_start in range(0, len(encoded), STREAM_CHUNK_BOOKS):
+            chunk = b','.join(encoded[chunk_start:chunk_start + STREAM_CHUNK_BOOKS])
+            yield (b',' if chunk_start else b'') + chunk
+        yield b'],"total":%d,"page":%d,"limit":%d,"total_pages":%d}' % (
+            total, page, limit, page_count(total, limit))
+    
+    return generate()
+
+def estimate_matches(field, needle):
+    """Upper bound on the books scan_column(field, needle) returns, with ties
+    broken towards fields with more distinct values"""
+    if field == 'isbn' and FULL_ISBN.fullmatch(needle):
+        bound = len(isbn_index.get(needle, ()))
+    elif len(needle) >= 3:
+        postings = trigram_index[field]
+        bound = min(len(postings.get(gram, ())) for gram in trigrams(needle))
+    else:
+        bound = len(books)
+    return bound, -field_selectivity[field]
+
+def filter_survivors(field, needle, surviving):
+    """Keep the books in surviving whose lowercased field contains needle"""
+    if field == 'isbn' and FULL_ISBN.fullmatch(needle):
+        return sorted(set(isbn_index.get(needle, ())).intersection(surviving))
+    values = value_index.get(field)
+    if values is not None and len(surviving) >= DICTIONARY_INTERSECT_FACTOR * len(values):
+        hits = [ids for value, ids in values.items() if needle in value]
+        if sum(map(len, hits)) < len(surviving):
+            return sorted(set(chain.from_iterable(hits)).intersection(surviving))
+    column = lower_index[field]
+    return [i for i in surviving if needle in column[i]]
+
 # Initialize books and load data at startup
 books = []
+lower_index = {}  # field -> lowercased values, parallel to books
+column_buffers = {}  # field -> (joined UTF-8 lower_index column, byte offset of each book plus end)
+trigram_index = {}  # field -> trigram -> ids of books whose lowercased field contains it
+field_selectivity = {}  # field -> share of distinct values, higher narrows results faster
+value_index = {}  # low-cardinality field -> lowercased value -> ids of books with that value
+isbn_index = {}  # complete lowercased ISBN -> ids of books whose isbn contains it
+# Everything build_search_index fills, in the order saved in the books cache
+search_indexes = (lower_index, column_buffers, trigram_index, field_selectivity, value_index, isbn_index)
+book_json = []  # orjson encoding of each book, parallel to books
+books_etag = ''  # digest of book_json, the base of /all ETags
+page_cache = {}  # (limit, page) -> (JSON body, gzipped JSON body or None)
 if not load_books_data():
     app.logger.error('Failed to initialize books data')
 
@@ -391,9 +902,7 @@ def health_check():
 
 @app.route('/all')
 @limiter.limit("100/day")
-@cache.cached(timeout=300, key_prefix=lambda: f"all_books_{request.args.get('page', 1)}_{request.args.get('limit', 100)}")
-@handle_errors
-@log_request
+@observe
 def get_all_books():
     limit = request.args.get('limit', default=100, type=int)
     page = request.args.get('page', default=1, type=int)
@@ -405,74 +914,116 @@ def get_all_books():
     # Ensure limit is positive and within bounds
     if limit < 1:
         limit = 100
+    elif limit > MAX_LIMIT:
+        limit = MAX_LIMIT
     
     # Validate page number
-    total_pages = (len(books) + limit - 1) // limit
+    total_pages = page_count(len(books), limit)
     if page < 1:
         page = 1
     elif page > total_pages:
         page = total_pages
     
-    # Calculate slice indices
-    start_idx = (page - 1) * limit
-    end_idx = min(start_idx + limit, len(books))  # Don't exceed array bounds
-    
-    # Get exactly 'limit' number of items
-    paginated_books = books[start_idx:end_idx]
+    # A page only changes with the books, so clients holding it skip the body
+    etag = f'{books_etag}-{page}-{limit}'
+    # Weak, because the plain and compressed bodies of a page share it
+    if etag_matches(etag):
+        response = Response(status=304)
+    else:
+        response = all_page_response(page, limit)
+    response.set_etag(etag, weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response
+
+def etag_matches(etag):
+    """Whether If-None-Match holds etag, also in the ':<encoding>' forms Flask-Compress hands out"""
+    tags = request.if_none_match
+    return tags.star_tag or etag in {tag.split(':')[0] for tag in tags.as_set(include_weak=True)}
+
+def all_page_response(page, limit):
+    """Response carrying one /all page, from page_cache when it is there"""
+    cached_page = page_cache.get((limit, page))
+    if cached_page is None:
+        if limit >= STREAM_MIN_BOOKS:
+            # Send large pages as they are encoded instead of building the whole body first
+            return Response(stream_with_context(stream_all_page(page, limit)), mimetype='application/json')
+        return Response(render_all_page(page, limit), mimetype='application/json')
     
-    return jsonify({
-        'books': paginated_books,
-        'total': len(books),
-        'page': page,
-        'limit': limit,
-        'total_pages': (len(books) + limit - 1) // limit
-    })
+    body, gzipped = cached_page
+    if gzipped is None:
+        return Response(body, mimetype='application/json')
+    # The quality lookup honours gzip;q=0 and *, which a membership test ignores
+    if request.accept_encodings['gzip'] > 0:
+        response = Response(gzipped, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    return response
+
+def search_cache_key():
+    """Cache key for /search built from the parameters it uses, independent of their order"""
+    params = sorted(request.args.items())
+    return 'search_' + hashlib.sha1(repr(params).encode('utf-8')).hexdigest()
+
+def cacheable_search_response(rv):
+    """Whether a /search response is worth caching: successful and not too large"""
+    return getattr(rv, 'status_code', None) == 200 and (rv.content_length or 0) <= RESPONSE_CACHE_MAX_BYTES
 
 @app.route('/search')
 @limiter.limit("200/day")
-@handle_errors
-@log_request
+@cache.cached(timeout=300, key_prefix=search_cache_key, response_filter=cacheable_search_response)
+@observe
 def search_books():
-    query_params = request.args.to_dict()
+    # MultiDict.items() yields the first value of each parameter, as to_dict() would
+    query_params = request.args
     
     if not query_params:
         app.logger.warning('Search attempted with no parameters')
         return jsonify({'error': 'No search parameters provided'}), 400
     
+    # Field names are known up front, so reject bad queries before any scanning
+    for field in query_params:
+        if field not in ALLOWED_FIELDS:
+            app.logger.warning('Invalid search field attempted: %s', field)
+            return jsonify({'error': f'Invalid field: {field}'}), 400
+    
     if not books:
         app.logger.error('Search attempted but no books available in the database')
         return jsonify({'error': 'No books available'}), 500
     
-    app.logger.info(f'Starting search with parameters: {query_params}')
+    app.logger.info('Starting search with parameters: %s', query_params)
     
-    try:
-        filtered_books = books
-        for field, value in query_params.items():
-            if field not in books[0].keys():
-                app.logger.warning(f'Invalid search field attempted: {field}')
-                return jsonify({'error': f'Invalid field: {field}'}), 400
-                
-            # Case-insensitive substring search
-            filtered_books = [
-                book for book in filtered_books 
-                if str(value).lower() in str(book[field]).lower()
-            ]
-            app.logger.info(f'After filtering by {field}={value}: {len(filtered_books)} books remaining')
-        
-        if not filtered_books:
-            app.logger.info('Search returned no results')
+    # Lower each search value once; stored columns are already lowercased.
+    # Apply the filters expected to match fewest books first so later
+    # filters scan fewer books
+    needles = [(field, value.lower()) for field, value in query_params.items()]
+    needles.sort(key=lambda item: estimate_matches(*item))
+    surviving = None
+    for field, needle in needles:
+        # Case-insensitive substring search against the precomputed column
+        if surviving is None:
+            surviving = scan_column(field, needle)
         else:
-            app.logger.info(f'Search completed successfully with {len(filtered_books)} results')
-        
-        return jsonify({
-            'books': filtered_books,
-            'total': len(filtered_books)
-        })
-    except Exception as e:
-        app.logger.error(f'Error during search: {str(e)}')
-        return jsonify({'error': 'Internal server error during search'}), 500
+            surviving = filter_survivors(field, needle, surviving)
+        app.logger.debug('After filtering by %s=%s: %d books remaining', field, needle, len(surviving))
+    
+    if not surviving:
+        app.logger.info('Search returned no results')
+    else:
+        app.logger.info('Search completed successfully with %d results', len(surviving))
+    
+    return jsonify({
+        'books': [books[i] for i in surviving],
+        'total': len(surviving)
+    })
 
 if __name__ == '__main__':
+    # Werkzeug's server handles one request at a time and is only meant for
+    # development; deployments run gunicorn with gunicorn.conf.py
+    if not os.getenv('FLASK_DEV'):
+        raise SystemExit('Use "gunicorn app:app" to serve the API, or set FLASK_DEV=1 to run the development server')
     # Use environment variable for port with a default of 8080
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
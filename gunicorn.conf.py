@@ -0,0 +1,44 @@
+import gc
+import multiprocessing
+import os
+import sys
+
+# Gunicorn picks this file up automatically when started from the project root
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Import app.py (and parse the books data) once in the master process, so
+# forked workers share the loaded corpus instead of each parsing it again
+preload_app = True
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Requests are answered from in-memory data, so few threads per worker are
+# enough to overlap slow clients and Redis round trips; with more than one
+# thread gunicorn runs the sync worker class as gthread. gevent (pip install
+# gevent) can be selected instead; gunicorn monkey-patches it in each worker
+# after fork.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Recycle workers periodically; with preload_app a replacement is just a
+# fork of the master, so this costs no reparsing
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 500))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+
+def when_ready(server):
+    # Move everything loaded by preload_app into the permanent generation
+    # before workers fork, so their garbage collection passes never write
+    # to the shared book objects and copy their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Preloaded workers inherit the log queue but not the master's listener
+    # thread, so each starts its own; without preload_app the worker's own
+    # import of app.py starts it
+    app = sys.modules.get('app')
+    if app is not None:
+        app.start_log_listener()
@@ -26,6 +26,69 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(data['page'], 2)
         self.assertEqual(data['limit'], 50)
 
+    def test_get_all_books_gzip(self):
+        # Popular pages are served pre-compressed to clients that accept gzip
+        import gzip
+        plain = self.app.get('/all?page=2')
+        response = self.app.get('/all?page=2', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(json.loads(gzip.decompress(response.data)), json.loads(plain.data))
+        
+        # Clients that refuse gzip get the plain body
+        for accept in ('gzip;q=0', '*;q=0', 'br;q=1, gzip;q=0'):
+            response = self.app.get('/all?page=2', headers={'Accept-Encoding': accept})
+            self.assertNotEqual(response.headers.get('Content-Encoding'), 'gzip')
+
+    def test_get_all_books_etag(self):
+        # Repeat requests carrying the page's ETag get an empty 304
+        for url in ('/all?page=3', '/all?page=2&limit=30', '/all?limit=1500'):
+            response = self.app.get(url)
+            etag = response.headers['ETag']
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('max-age=300', response.headers['Cache-Control'])
+            
+            response = self.app.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+        
+        # ETags of compressed responses name their encoding but still match
+        response = self.app.get('/all?page=2&limit=30', headers={'Accept-Encoding': 'br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        response = self.app.get('/all?page=2&limit=30', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        
+        # A coding refused with q=0 is not used
+        response = self.app.get('/all?page=2&limit=30', headers={'Accept-Encoding': 'br;q=0, gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        response = self.app.get('/all?page=2&limit=30', headers={'Accept-Encoding': 'br;q=0, gzip;q=0'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        
+        # Another page has another ETag
+        response = self.app.get('/all?page=4', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_all_books_large_page(self):
+        # Large pages are streamed but must match the regular page layout
+        response = self.app.get('/all?page=2&limit=1500')
+        data = json.loads(response.data)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['page'], 2)
+        self.assertEqual(data['limit'], 1500)
+        self.assertEqual(data['total_pages'], (data['total'] + 1499) // 1500)
+        self.assertLessEqual(len(data['books']), 1500)
+
+        # Limits above the maximum are clamped
+        import app
+        response = self.app.get(f'/all?limit={app.MAX_LIMIT * 10}')
+        data = json.loads(response.data)
+        self.assertEqual(data['limit'], app.MAX_LIMIT)
+        self.assertEqual(len(data['books']), min(app.MAX_LIMIT, data['total']))
+
     def test_search_single_parameter(self):
         # Test search by name
         response = self.app.get('/search?name=harry')
@@ -45,6 +108,31 @@ class TestAPI(unittest.TestCase):
             self.assertIn('j', book['author'].lower())
             self.assertIn('english', book['language'].lower())
 
+    def test_search_isbn(self):
+        # A complete ISBN matches the same books as a substring scan would
+        import app
+        for isbn in ('978-0-312-20616-1', '0-312-20616-1', '0749396385', '0000000000'):
+            response = self.app.get(f'/search?isbn={isbn}&language=english')
+            data = json.loads(response.data)
+            expected = [book for book in app.books
+                        if isbn in book['isbn'].lower() and 'english' in book['language'].lower()]
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(data['books'], expected)
+
+    def test_search_cache_size(self):
+        # Small results are cached, results over the size cap are not
+        import app
+        for query, cached in (('name=harry', True), ('language=e', False)):
+            response = self.app.get(f'/search?{query}', headers={'Accept-Encoding': 'br'})
+            self.assertEqual(response.status_code, 200)
+            with app.app.test_request_context(f'/search?{query}'):
+                self.assertEqual(app.cache.get(app.search_cache_key()) is not None, cached)
+            # The compressed copy is only kept for small results too
+            with app.app.test_request_context(f'/search?{query}', headers={'Accept-Encoding': 'br'}):
+                compressed_key = app.compress_cache_key(app.request)
+            self.assertEqual(app.cache.get(compressed_key) is not None, cached)
+
     def test_search_invalid_field(self):
         # Test search with invalid field
         response = self.app.get('/search?invalid_field=value')
@@ -53,6 +141,10 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn('error', data)
         self.assertIn('Invalid field', data['error'])
+        
+        # An invalid field is rejected even after valid ones
+        response = self.app.get('/search?name=harry&invalid_field=value')
+        self.assertEqual(response.status_code, 400)
 
     def test_search_no_parameters(self):
         # Test search with no parameters
@@ -131,7 +223,7 @@ class TestAPI(unittest.TestCase):
             mock_response.iter_content = MagicMock(return_value=[test_content.encode('utf-8')])
             
             # Test LFS download
-            with patch('requests.get', return_value=mock_response) as mock_get:
+            with patch.object(app.http_session, 'get', return_value=mock_response) as mock_get:
                 result = app.load_books_data()
                 mock_get.assert_called_once()
                 
@@ -142,6 +234,25 @@ class TestAPI(unittest.TestCase):
                 self.assertTrue(result)
                 self.assertEqual(len(app.books), 1)
                 self.assertEqual(app.books[0]['name'], 'Test Book')
+
+            # Lines split across download chunks are parsed whole and saved unchanged
+            with open(test_file, 'w') as f:
+                f.write('version https://git-lfs.github.com/spec/v1\n')
+            content = (test_content * 2).encode('utf-8')
+            mock_response.iter_content = MagicMock(return_value=[content[:7], content[7:60], content[60:]])
+            with patch.object(app.http_session, 'get', return_value=mock_response):
+                self.assertTrue(app.load_books_data())
+                self.assertEqual(len(app.books), 2)
+            with open(test_file, 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+            # A download that is itself a pointer file must not be retried forever
+            with open(test_file, 'w') as f:
+                f.write('version https://git-lfs.github.com/spec/v1\n')
+            mock_response.iter_content = MagicMock(return_value=[b'version https://git-lfs.github.com/spec/v1\n'])
+            with patch.object(app.http_session, 'get', return_value=mock_response) as mock_get:
+                self.assertFalse(app.load_books_data())
+                mock_get.assert_called_once()
             
         finally:
             # Cleanup
@@ -153,6 +264,157 @@ class TestAPI(unittest.TestCase):
             # Restore original books
             app.books.clear()
             app.books.extend(original_books)
+            app.build_indexes()
+
+    def test_books_cache(self):
+        """Test that parsed books are reused from the pickle cache"""
+        import app
+        import os
+        import tempfile
+        import shutil
+        from unittest.mock import patch
+        
+        original_data_file = os.getenv('DATA_FILE', 'data/found_books_filtered.ndjson')
+        original_books = app.books.copy()
+        
+        test_dir = tempfile.mkdtemp()
+        test_file = os.path.join(test_dir, 'test_books.ndjson')
+        test_book = ['metadata', {'name': 'Cached Book', 'author': 'Test Author'}]
+        
+        try:
+            os.environ['DATA_FILE'] = test_file
+            with open(test_file, 'w') as f:
+                f.write(json.dumps(test_book) + '\n')
+            
+            # First load parses the file and writes the cache
+            self.assertTrue(app.load_books_data())
+            self.assertTrue(os.path.exists(test_file + '.pkl'))
+            
+            # Second load must not parse the NDJSON again
+            with patch('orjson.loads') as mock_loads:
+                self.assertTrue(app.load_books_data())
+                mock_loads.assert_not_called()
+            self.assertEqual(len(app.books), 1)
+            self.assertEqual(app.books[0]['name'], 'Cached Book')
+            self.assertEqual(app.books[0]['isbn'], '')
+            # The search index comes from the cache too
+            self.assertEqual(app.scan_column('name', 'cached'), [0])
+            
+            # A newer data file invalidates the cache
+            with open(test_file, 'a') as f:
+                f.write(json.dumps(test_book) + '\n')
+            os.utime(test_file, (os.path.getmtime(test_file + '.pkl') + 1,) * 2)
+            self.assertTrue(app.load_books_data())
+            self.assertEqual(len(app.books), 2)
+        finally:
+            shutil.rmtree(test_dir)
+            os.environ['DATA_FILE'] = original_data_file
+            app.books.clear()
+            app.books.extend(original_books)
+            app.build_indexes()
+
+    def test_redis_unix_socket_url(self):
+        """Test that the app starts with a unix socket REDIS_URL"""
+        import os
+        import subprocess
+        import sys
+        
+        env = dict(os.environ, REDIS_URL='unix:///tmp/redis-test.sock', DATA_FILE='missing.ndjson')
+        result = subprocess.run(
+            [sys.executable, '-c', 'import app; print(app.LIMITER_STORAGE_URI)'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True)
+        
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'redis+unix:///tmp/redis-test.sock')
+
+    def test_unreachable_redis(self):
+        """Test that books load and index with the cache backend down"""
+        import os
+        import subprocess
+        import sys
+        
+        script = ('import app; print(len(app.books) > 0, bool(app.page_cache), '
+                  'app.scan_column("name", "harry") == [i for i, book in enumerate(app.books) '
+                  'if "harry" in book["name"].lower()])')
+        # Once from the books cache and once parsing the data file
+        for cache_file in (None, ''):
+            env = dict(os.environ, REDIS_URL='redis://127.0.0.1:1/0')
+            env.pop('DATA_FILE', None)
+            if cache_file is not None:
+                env['BOOKS_CACHE_FILE'] = cache_file
+            result = subprocess.run(
+                [sys.executable, '-c', script],
+                cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True)
+            
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(result.stdout.split(), ['True', 'True', 'True'])
+
+    def test_log_listener(self):
+        """Test that start_log_listener drains log_queue into the file handler"""
+        import app
+        import atexit
+        import logging
+        import os
+        import queue
+        import tempfile
+        import shutil
+        from logging.handlers import QueueHandler, RotatingFileHandler
+        
+        saved = app.log_queue, getattr(app, 'file_handler', None)
+        test_dir = tempfile.mkdtemp()
+        log_file = os.path.join(test_dir, 'api.log')
+        logger = logging.getLogger('test_log_listener')
+        app.log_queue = queue.SimpleQueue()
+        app.file_handler = RotatingFileHandler(log_file)
+        handler = QueueHandler(app.log_queue)
+        logger.addHandler(handler)
+        try:
+            # A preloaded worker inherits the queue; its listener is fresh
+            listener = app.start_log_listener()
+            atexit.unregister(listener.stop)
+            self.assertIs(listener.queue, app.log_queue)
+            self.assertTrue(listener._thread.is_alive())
+            
+            logger.warning('record from worker')
+            listener.stop()
+            with open(log_file) as f:
+                self.assertIn('record from worker', f.read())
+        finally:
+            logger.removeHandler(handler)
+            app.file_handler.close()
+            app.log_queue, app.file_handler = saved
+            shutil.rmtree(test_dir)
+        
+        # Without LOG_TO_FILE there is no queue and nothing to start
+        app.log_queue = None
+        self.assertIsNone(app.start_log_listener())
+        app.log_queue = saved[0]
+
+    def test_parse_books_parallel(self):
+        """Test that parsing in byte ranges matches a serial parse"""
+        import app
+        import logging
+        import os
+        import tempfile
+        import shutil
+        
+        test_dir = tempfile.mkdtemp()
+        test_file = os.path.join(test_dir, 'test_books.ndjson')
+        try:
+            with open(test_file, 'w') as f:
+                for i in range(50):
+                    f.write(json.dumps(['metadata', {'name': f'Book {i}'}]) + '\n')
+                f.write('not json\n')
+                f.write(json.dumps(['metadata']) + '\n')
+            
+            serial = app.parse_books(test_file)
+            self.assertEqual(len(serial[0]), 50)
+            self.assertEqual(serial[1], 52)
+            self.assertEqual([(p[0], p[2]) for p in serial[2]], [(logging.ERROR, 51), (logging.WARNING, 52)])
+            for workers in (2, 3, 7):
+                self.assertEqual(app.parse_books_parallel(test_file, workers), serial)
+        finally:
+            shutil.rmtree(test_dir)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file